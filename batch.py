@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# File:  batch.py
+# Created on:  Sun Oct 18 11:27:30 UTC 2026
+'''Run a solver on every *.smp file of a directory and check its answers with
+chk.py, like chk_all.sh but with several files at once and without stopping
+at the first failure. Optionally writes a JSON summary.'''
+import sys, os, glob, json, time, shlex, signal, asyncio, argparse
+from asyncio.subprocess import PIPE, DEVNULL, STDOUT
+
+checker = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chk.py')
+
+async def _run(cmd, stdin=None, input=None, timeout=None, shell=False, stderr=DEVNULL):
+    '''run cmd in its own session, returns (exit code, stdout), the exit code
+    is None if the whole session was killed after timeout seconds'''
+    if shell:
+        p = await asyncio.create_subprocess_shell(cmd, stdin=stdin or PIPE, stdout=PIPE, stderr=stderr, start_new_session=True)
+    else:
+        p = await asyncio.create_subprocess_exec(*cmd, stdin=stdin or PIPE, stdout=PIPE, stderr=stderr, start_new_session=True)
+    try:
+        out, _ = await asyncio.wait_for(p.communicate(input), timeout)
+    except asyncio.TimeoutError:
+        return None, b''
+    finally:
+        if p.returncode is None:
+            try:
+                os.killpg(p.pid, signal.SIGKILL) # also the solver started by the script
+            except ProcessLookupError:
+                pass
+            await p.wait()
+    return p.returncode, out
+
+async def run_one(solver, fn, timeout=None):
+    '''solve and check one sample file, returns its summary entry'''
+    rv = {'file': fn}
+    t0 = time.perf_counter()
+    with open(fn) as f:
+        # through the shell, solvers like proj1 are scripts without #!
+        rc, out = await _run(shlex.quote(solver), stdin=f, timeout=timeout, shell=True)
+    rv['solve_time'] = time.perf_counter() - t0
+    rv['answer'] = None
+    if rc is None:
+        rv.update(check_time=0.0, status='TIMEOUT', message='no answer after {}s'.format(timeout))
+        return rv
+    t0 = time.perf_counter()
+    crc, c = await _run([sys.executable, checker, fn], input=out, stderr=STDOUT)
+    rv['check_time'] = time.perf_counter() - t0
+    lns = str(c, encoding='utf-8').splitlines()
+    rv['status'] = 'OK' if crc == 0 else 'FAIL'
+    if crc == 0:
+        rv['answer'] = 'UNSAT' if 'OK (UNSAT)' in lns else 'SAT'
+    else:
+        rv['message'] = lns[-1] if lns else 'solver exit code {}'.format(rc)
+    return rv
+
+async def run_all(solver, files, jobs=None, timeout=None, done=None):
+    '''run_one on files with at most jobs of them at once, all from one event
+    loop; done is called with every entry in the order of files.
+    Returns the list of entries'''
+    sem = asyncio.Semaphore(jobs or os.cpu_count())
+    async def one(fn):
+        async with sem:
+            return await run_one(solver, fn, timeout)
+    tasks = [asyncio.ensure_future(one(fn)) for fn in files]
+    rv = []
+    for t in tasks:
+        rv.append(await t)
+        if done: done(rv[-1])
+    return rv
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('solver')
+    ap.add_argument('directory', help='directory with samples')
+    ap.add_argument('-j', '--jobs', type=int, help='number of files handled at once (default: all cores)')
+    ap.add_argument('--summary', metavar='FILE', help='write a JSON summary into FILE')
+    ap.add_argument('--timeout', type=float, metavar='SEC', help='kill the solver after SEC seconds per file')
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    files = sorted(glob.glob(os.path.join(args.directory, '*.smp')))
+    def report(rv):
+        print('{} {} {} ({:.2f}s)'.format(rv['file'], rv['status'], rv['answer'] or '', rv['solve_time'] + rv['check_time']))
+        if rv['status'] != 'OK': print('   ' + rv['message'])
+        sys.stdout.flush()
+    results = asyncio.run(run_all(args.solver, files, args.jobs, args.timeout, report))
+    failed = sum(1 for rv in results if rv['status'] != 'OK')
+    summary = {
+        'solver': args.solver,
+        'directory': args.directory,
+        'total': len(results),
+        'failed': failed,
+        'wall_time': time.perf_counter() - t0,
+        'files': results,
+    }
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            json.dump(summary, f, indent=1)
+    if failed:
+        print('{} of {} FAILED'.format(failed, len(results)))
+        sys.exit(1)
+    print('All OK - GREAT SUCCESS')
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# File:  bench.py
+# Created on:  Sun Oct 18 11:28:06 UTC 2026
+'''Benchmark the phases of loops_stub.py on sample directories and on random datasets.
+
+Every suite (a directory or a random configuration) reports the time spent
+in parsing, encoding, writing the CNF, solving and decoding the model, and
+the number of CNF variables and clauses. Results can be saved as JSON and
+compared against a saved baseline, regressions are reported and make the
+exit code 1.'''
+import sys, os, io, glob, json, time, random, argparse, contextlib
+import cardinality
+from loops_stub import Enc, parse
+from metrics import FamilyMetrics
+from solvers import run_solver
+
+phases = ['parse', 'enc', 'mk_cnf', 'solve', 'decode']
+
+def random_samples(input_count, sample_count, seed):
+    '''text of a .smp file with random features; the class is
+    f1 xor (f2 and f3) so that a tree of 11 nodes always exists'''
+    rnd = random.Random(seed)
+    lns = []
+    for _ in range(sample_count):
+        x = [rnd.randint(0, 1) for _ in range(input_count)]
+        lns.append(' '.join(map(str, x + [x[0] ^ (x[1] & x[2])])))
+    return lns
+
+def bench_one(text, opts=None, metrics=None):
+    '''run all phases on the text of a .smp file with the keyword options
+    opts of Enc, returns times and sizes; metrics records the constraint families'''
+    rv = dict.fromkeys(phases, 0.0)
+    t0 = time.perf_counter()
+    nms, samples = parse(io.StringIO(text))
+    t1 = time.perf_counter()
+    e = Enc(nms[0], nms[1], metrics=metrics, **(opts or {}))
+    e.enc(samples)
+    t2 = time.perf_counter()
+    e.mk_cnf(False)
+    t3 = time.perf_counter()
+    rc, model = run_solver(e, keep=e.model_vars())
+    t4 = time.perf_counter()
+    if rc == 10:
+        with contextlib.redirect_stdout(io.StringIO()):
+            e.print_model(model)
+    t5 = time.perf_counter()
+    rv.update(parse=t1-t0, enc=t2-t1, mk_cnf=t3-t2, solve=t4-t3, decode=t5-t4)
+    rv.update(vars=e.var_count, clauses=len(e.constraints), sat=int(rc == 10))
+    return rv
+
+def bench_suite(texts, opts=None, metrics=None):
+    '''sum of bench_one over texts'''
+    total = dict()
+    for text in texts:
+        for k, v in bench_one(text, opts, metrics).items():
+            total[k] = total.get(k, 0) + v
+    total['instances'] = len(texts)
+    return total
+
+def suites(dirs, configs, limit, seed):
+    '''yields (name, texts) for the sample directories and the random configurations'''
+    for d in dirs:
+        files = sorted(glob.glob(os.path.join(d, '*.smp')))[:limit]
+        texts = []
+        for fn in files:
+            with open(fn) as f:
+                texts.append(f.read())
+        yield d, texts
+    for (k, n, s) in configs:
+        yield 'random_{}_{}_{}'.format(k, n, s), \
+            ['\n'.join(['{} {}'.format(k, n)] + random_samples(k, s, seed + i)) for i in range(limit or 5)]
+
+def compare(results, baseline, tolerance, min_time):
+    '''list of regressions of results against baseline: phases slower by more
+    than tolerance (and min_time seconds) and changed CNF sizes'''
+    rv = []
+    for name, r in results.items():
+        if name not in baseline: continue
+        b = baseline[name]
+        if r['instances'] != b['instances']:
+            rv.append('{}: {} instances, baseline has {}'.format(name, r['instances'], b['instances']))
+            continue
+        for ph in phases:
+            if r[ph] > b[ph] * (1 + tolerance) and r[ph] - b[ph] > min_time:
+                rv.append('{}: {} {:.3f}s -> {:.3f}s'.format(name, ph, b[ph], r[ph]))
+        for k in ('vars', 'clauses', 'sat'):
+            if r[k] != b[k]:
+                rv.append('{}: {} {} -> {}'.format(name, k, b[k], r[k]))
+    return rv
+
+def parse_config(s):
+    k, n, c = map(int, s.split(','))
+    return (k, n, c)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('dirs', nargs='*', default=['t6_sat', 't6_unsat', 't10_6_unsat'])
+    ap.add_argument('--random', metavar='K,N,S', type=parse_config, nargs='*',
+                    default=[(6, 11, 50), (8, 13, 100), (10, 15, 200), (12, 17, 400)],
+                    help='random datasets with K features, S samples solved for N nodes')
+    ap.add_argument('--limit', type=int, help='instances per suite (default: all files, 5 random datasets)')
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--amo', choices=['auto'] + sorted(cardinality.encodings), default='auto')
+    ap.add_argument('--symmetry', action='store_true', help='add symmetry breaking constraints')
+    ap.add_argument('--families', action='store_true',
+                    help='also print clauses, fresh variables, time and memory peak of every constraint family (slows encoding down)')
+    ap.add_argument('--save', metavar='FILE', help='save the results as JSON')
+    ap.add_argument('--baseline', metavar='FILE', help='compare with results saved by --save')
+    ap.add_argument('--tolerance', type=float, default=0.2, help='allowed relative slowdown (default: %(default)s)')
+    ap.add_argument('--min-time', type=float, default=0.05, help='ignore slowdowns below this many seconds (default: %(default)s)')
+    args = ap.parse_args()
+
+    results = dict()
+    print('{:<20} {:>5} {:>9} {:>9}'.format('suite', 'inst', 'vars', 'clauses') + ''.join(' {:>8}'.format(ph) for ph in phases))
+    if args.families:
+        print('  {:<13} {:>9} {:>9} {:>8} {:>9}'.format('family', 'fresh', 'clauses', 'time', 'peak'))
+    for name, texts in suites(args.dirs, args.random, args.limit, args.seed):
+        metrics = FamilyMetrics() if args.families else None
+        r = results[name] = bench_suite(texts, dict(amo=args.amo, symmetry=args.symmetry), metrics)
+        print('{:<20} {:>5} {:>9} {:>9}'.format(name, r['instances'], r['vars'], r['clauses'])
+              + ''.join(' {:>8.3f}'.format(r[ph]) for ph in phases))
+        if metrics:
+            r['families'] = metrics.totals()
+            for t in r['families']:
+                print('  family {:<6} {:>9} {:>9} {:>8.3f} {:>8}K'.format(t['family'], t['fresh_vars'], t['clauses'],
+                                                                         t['time'], t['peak_bytes'] >> 10))
+        sys.stdout.flush()
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_time)
+        for r in regressions:
+            print('REGRESSION ' + r)
+        if regressions: sys.exit(1)
+        print('no regressions')
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# File:  bench_amo.py
+# Created on:  Sun Oct 18 11:22:40 UTC 2026
+'''Compare the at-most-one encodings of cardinality.py on sample directories.
+
+For every encoding and directory prints the total number of variables and
+clauses, the number of SAT/UNSAT answers and the total solving time.
+'''
+import sys, glob, time, argparse
+import cardinality
+from loops_stub import Enc, parse
+from solvers import run_solver
+
+def bench(files, amo):
+    vs = cs = sat = unsat = 0
+    t = 0.0
+    for fn in files:
+        with open(fn) as f:
+            nms, samples = parse(f)
+        e = Enc(nms[0], nms[1], amo=amo)
+        e.enc(samples)
+        vs += e.var_count
+        cs += len(e.constraints)
+        t0 = time.perf_counter()
+        rc, _ = run_solver(e)
+        t += time.perf_counter() - t0
+        if rc == 10: sat += 1
+        elif rc == 20: unsat += 1
+    return vs, cs, sat, unsat, t
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('dirs', nargs='*', default=['t6_sat', 't6_unsat', 't10_6_unsat'])
+    ap.add_argument('--amo', nargs='+', choices=['auto'] + sorted(cardinality.encodings),
+                    default=['auto'] + sorted(cardinality.encodings))
+    ap.add_argument('--limit', type=int, default=None, help='use only the first LIMIT files of each directory')
+    args = ap.parse_args()
+
+    print('{:<12} {:<10} {:>9} {:>9} {:>5} {:>5} {:>9}'.format('dir', 'amo', 'vars', 'clauses', 'sat', 'unsat', 'solve[s]'))
+    for d in args.dirs:
+        files = sorted(glob.glob(d + '/*.smp'))[:args.limit]
+        for amo in args.amo:
+            vs, cs, sat, unsat, t = bench(files, amo)
+            print('{:<12} {:<10} {:>9} {:>9} {:>5} {:>5} {:>9.2f}'.format(d, amo, vs, cs, sat, unsat, t))
+            sys.stdout.flush()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# File:  cardinality.py
+# Created on:  Sun Oct 18 11:22:40 UTC 2026
+'''At-most-one encodings for Enc.
+
+Every encoding takes the encoder e (for add_constraint and mk_fresh) and a
+list of integer literals, and adds clauses to e that allow at most one of
+the literals to be true.
+'''
+from itertools import combinations
+
+def pairwise(e, l):
+    '''binomial encoding, no auxiliary variables, O(n^2) clauses'''
+    for x,y in combinations(l,2):
+        e.add_constraint([-x,-y])
+
+def seq_counter(e, l):
+    '''sequential counter of Sinz, n-1 auxiliary variables, 3n-4 clauses'''
+    n = len(l)
+    if n < 2: return
+    s = [e.mk_fresh('seq', x) for x in l[:-1]] # s[i] iff some of l[0..i] is true
+    e.add_constraint([-l[0], s[0]])
+    for i in range(1, n-1):
+        e.add_constraint([-l[i], s[i]])
+        e.add_constraint([-s[i-1], s[i]])
+        e.add_constraint([-l[i], -s[i-1]])
+    e.add_constraint([-l[-1], -s[-1]])
+
+def ladder(e, l):
+    '''ladder encoding of Gent and Nightingale, only the channelling
+    implications from the literals to the ladder are needed for at-most-one'''
+    n = len(l)
+    if n < 2: return
+    y = [e.mk_fresh('ladder', x) for x in l[:-1]] # y[i] iff some of l[i+1..] is true
+    for i in range(n-2):
+        e.add_constraint([-y[i+1], y[i]])
+    for i in range(n):
+        if i > 0: e.add_constraint([-l[i], y[i-1]])
+        if i < n-1: e.add_constraint([-l[i], -y[i]])
+
+def commander(e, l, group=3):
+    '''commander encoding of Klieber and Kwon, groups of size group
+    are handled pairwise and their commanders recursively'''
+    if len(l) <= group + 1:
+        pairwise(e, l)
+        return
+    cs = []
+    for g in range(0, len(l), group):
+        gl = l[g:g+group]
+        pairwise(e, gl)
+        c = e.mk_fresh('cmd', *gl)
+        for x in gl:
+            e.add_constraint([-x, c])
+        e.add_constraint([-c] + gl)
+        cs.append(c)
+    commander(e, cs, group)
+
+def bimander(e, l, group=2):
+    '''bimander encoding of Hoelldobler and Nguyen, groups of size group
+    are handled pairwise and identified by a binary number'''
+    n = len(l)
+    if n < 2: return
+    gs = [l[g:g+group] for g in range(0, n, group)]
+    bits = [e.mk_fresh('bim', i) for i in range(max(1, (len(gs)-1).bit_length()))]
+    for i, gl in enumerate(gs):
+        pairwise(e, gl)
+        for h, b in enumerate(bits):
+            lit = b if (i >> h) & 1 else -b
+            for x in gl:
+                e.add_constraint([-x, lit])
+
+encodings = {
+    'pairwise': pairwise,
+    'seq': seq_counter,
+    'ladder': ladder,
+    'commander': commander,
+    'bimander': bimander,
+}
+
+pairwise_limit = 6 # up to this size the pairwise encoding is the smallest in practice
+
+def atmost_one(e, l, kind='auto'):
+    '''add at-most-one constraint over the literals l to e using encoding kind,
+    'auto' picks pairwise for short lists and sequential counter otherwise'''
+    if kind == 'auto':
+        kind = 'pairwise' if len(l) <= pairwise_limit else 'seq'
+    encodings[kind](e, l)
@@ -4,22 +4,16 @@
 # Created on:  Fri Oct 11 14:18:32 WEST 2019
 # Copyright (C) 2019, Mikolas Janota
 import sys
+from samples import load_samples
+try:
+    import numpy as np
+except ImportError: # fall back to evaluating one sample at a time
+    np = None
+
 def err(msg):
     print("ERROR:", msg)
     exit(1)
 
-def parse_samples(f):
-    nms = None
-    samples = []
-    for l in f:
-        s = l.rstrip().split()
-        if not s: continue
-        if nms:
-            samples.append([int(l) for l in s])
-        else:
-            nms = [int(l) for l in s]
-    return (nms, samples)
-
 def chk(ls, samples):
     lns = dict() #  left children
     rns = dict() #  right children
@@ -74,28 +68,51 @@ def chk(ls, samples):
 
     check_structure(1, set())
 
-    def get_val(nd, sample):
-        if nd in fl: return 0
-        if nd in tl: return 1
-        ftr = a[nd]
-        nxt = lns[nd] if sample[ftr - 1] == 0 else rns[nd] 
-        return get_val(nxt, sample)
-
-    for sample  in samples:
-        if sample[-1] != get_val(1, sample):
-            err('FAIL on sample {} '.format(sample))
-            return False
-        else:
-            print('OK on {} '.format(sample))
+    if np is not None and len(samples):
+        bad = eval_batch(lns, rns, a, tl, samples)
+    else:
+        bad = [i for i, sample in enumerate(samples) if sample[-1] != get_val(lns, rns, a, tl, sample)]
+    for i in bad:
+        print('FAIL on sample {} '.format(list(map(int, samples[i]))))
+    if bad: err('{} of {} samples misclassified'.format(len(bad), len(samples)))
+    print('OK on {} samples'.format(len(samples)))
     return True
 
+def get_val(lns, rns, a, tl, sample):
+    nd = 1
+    while nd in a:
+        nd = lns[nd] if sample[a[nd] - 1] == 0 else rns[nd]
+    return 1 if nd in tl else 0
+
+def eval_batch(lns, rns, a, tl, samples):
+    '''route all samples through the tree at once, one step per level,
+    returns the indices of the misclassified samples'''
+    n = max([1] + list(lns) + list(lns.values()) + list(rns) + list(rns.values()) + list(a) + list(tl)) # also unreachable nodes
+    feature = np.zeros(n + 1, dtype=np.int64) # 0 for leaves
+    left = np.zeros(n + 1, dtype=np.int64)
+    right = np.zeros(n + 1, dtype=np.int64)
+    cls = np.zeros(n + 1, dtype=np.int8)
+    for nd, f in a.items(): feature[nd] = f
+    for nd, c in lns.items(): left[nd] = c
+    for nd, c in rns.items(): right[nd] = c
+    for nd in tl: cls[nd] = 1
+    m = np.asarray(samples)
+    nodes = np.ones(len(samples), dtype=np.int64)
+    rows = np.arange(len(samples))
+    while True:
+        internal = np.nonzero(feature[nodes])[0] # samples not in a leaf yet
+        if not len(internal): break
+        nds = nodes[internal]
+        go_right = m[rows[internal], feature[nds] - 1] != 0
+        nodes[internal] = np.where(go_right, right[nds], left[nds])
+    return np.nonzero(cls[nodes] != m[:, -1])[0].tolist()
+
 if __name__ == "__main__":
     if len(sys.argv) != 2:
         print('USAGE: {} <sample-file>'.format(sys.argv[0]))
         exit(1)
 
-    with open(sys.argv[1]) as sf:
-        nms, samples = parse_samples(sf)
+    nms, samples = load_samples(sys.argv[1])
 
     if chk(sys.stdin, samples):
         print('OK')
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# File:  clauses.py
+# Created on:  Sun Oct 18 11:48:07 UTC 2026
+'''Compact clause database of Enc.
+
+The literals of all clauses are kept in one flat array of C ints, every
+clause closed by 0 as in DIMACS, and ends[i] is the position just after the
+0 of clause i. Iterating yields the clauses as lists of ints. Clauses must
+not be empty.
+'''
+from array import array
+from bisect import bisect_right
+
+class Clauses:
+    __slots__ = ('lits', 'ends')
+
+    def __init__(self):
+        self.lits = array('i')
+        self.ends = array('q')
+
+    def __len__(self):
+        return len(self.ends)
+
+    def __iter__(self):
+        return self.clauses()
+
+    def __getstate__(self):
+        return (self.lits, self.ends)
+
+    def __setstate__(self, state):
+        self.lits, self.ends = state
+
+    def clauses(self, start=0):
+        '''yields the clauses from clause number start on as lists'''
+        lits = self.lits
+        b = self.ends[start - 1] if start else 0
+        for e in self.ends[start:]:
+            yield lits[b:e-1].tolist()
+            b = e
+
+    def append(self, c):
+        '''add the clause c, a list of literals'''
+        self.lits.extend(c)
+        self.lits.append(0)
+        self.ends.append(len(self.lits))
+
+    def extend(self, other):
+        '''add all clauses of the Clauses other'''
+        n = len(self.lits)
+        self.lits.extend(other.lits)
+        if n:
+            self.ends.extend(array('q', (e + n for e in other.ends)))
+        else:
+            self.ends.extend(other.ends)
+
+    def extend_rows(self, m):
+        '''add the rows of the NumPy integer matrix m as clauses of equal length'''
+        import numpy as np
+        rows, width = m.shape
+        if not rows: return
+        block = np.zeros((rows, width + 1), dtype=np.int32)
+        block[:, :width] = m
+        n = len(self.lits)
+        self.lits.frombytes(block.tobytes())
+        self.ends.frombytes(np.arange(n + width + 1, n + rows * (width + 1) + 1, width + 1, dtype=np.int64).tobytes())
+
+    def copy(self):
+        rv = Clauses()
+        rv.lits = array('i', self.lits)
+        rv.ends = array('q', self.ends)
+        return rv
+
+    def chunks(self, chunk=1 << 16):
+        '''yields the clauses in DIMACS (without header) as strings of about
+        chunk literals, each formatted when it is taken'''
+        lits, ends = self.lits, self.ends
+        b, i = 0, 0
+        while i < len(ends):
+            i = min(len(ends), max(i + 1, bisect_right(ends, b + chunk)))
+            e = ends[i-1]
+            # clauses are not empty, so ' 0 ' only follows the end of a clause
+            yield ('%d ' * (e - b) % tuple(lits[b:e])).replace(' 0 ', ' 0\n')
+            b = e
+
+    def write(self, out, chunk=1 << 16):
+        '''write the clauses in DIMACS (without header) into the text stream out'''
+        for s in self.chunks(chunk):
+            out.write(s)
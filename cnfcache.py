@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# File:  cnfcache.py
+# Created on:  Sun Oct 18 11:40:47 UTC 2026
+'''On-disk cache of encoded CNFs.
+
+Entries are keyed by a hash of the normalized samples (duplicates dropped,
+sorted), the numbers of features and nodes and the encoder options, and
+hold the number of variables and the clauses of Enc. Variable ids of the
+encoder only depend on the numbers of features and nodes, so the tree can
+be decoded from a cached CNF. The least recently used entries are removed
+when the cache grows over its size limit. Entries are pickles, so the cache
+directory must not be writable by others.
+'''
+import os, pickle, hashlib
+try:
+    import numpy as np
+except ImportError:
+    np = None
+from samples import unique_rows
+
+VERSION = 3 # bump when the encoding changes
+default_dir = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'acl_proj1', 'cnf')
+
+class CnfCache:
+    def __init__(self, path=default_dir, max_bytes=1 << 30):
+        self.path = path
+        self.max_bytes = max_bytes
+
+    def key(self, input_count, node_count, samples, opts):
+        '''hash identifying the CNF of the samples under the encoder options opts'''
+        h = hashlib.sha256()
+        h.update(repr((VERSION, input_count, node_count, sorted(opts.items()))).encode('ascii'))
+        if np is not None and isinstance(samples, np.ndarray): # the same bytes as for lists
+            h.update(unique_rows(samples)[0].tobytes())
+            return h.hexdigest()
+        for s in sorted(set(map(tuple, samples))):
+            h.update(bytes(s))
+        return h.hexdigest()
+
+    def structure_key(self, input_count, node_count, amo, symmetry):
+        '''hash identifying the sample independent part of the encoding'''
+        h = hashlib.sha256()
+        h.update(repr((VERSION, 'structure', input_count, node_count, amo, symmetry)).encode('ascii'))
+        return h.hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.path, key + '.cnf.pickle')
+
+    def get(self, key):
+        '''returns (variable count, clauses) or None'''
+        fn = self._file(key)
+        try:
+            with open(fn, 'rb') as f:
+                rv = pickle.load(f)
+            os.utime(fn) # the modification time orders the entries for eviction
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        return rv
+
+    def put(self, key, var_count, constraints):
+        os.makedirs(self.path, exist_ok=True)
+        fn = self._file(key)
+        tmp = '{}.{}'.format(fn, os.getpid())
+        with open(tmp, 'wb') as f:
+            pickle.dump((var_count, constraints), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, fn)
+        self.evict()
+
+    def evict(self):
+        '''remove least recently used entries until the cache fits into max_bytes'''
+        entries = []
+        for nm in os.listdir(self.path):
+            if not nm.endswith('.cnf.pickle'): continue
+            try:
+                st = os.stat(os.path.join(self.path, nm))
+            except OSError: # removed by a concurrent run
+                continue
+            entries.append((st.st_mtime, st.st_size, nm))
+        total = sum(size for (_, size, _) in entries)
+        for (_, size, nm) in sorted(entries):
+            if total <= self.max_bytes: break
+            try:
+                os.remove(os.path.join(self.path, nm))
+            except OSError:
+                pass
+            total -= size
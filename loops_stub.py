@@ -3,57 +3,151 @@
 # Author:  mikolas
 # Created on:  Sat Oct 12 10:30:54 WEST 2019
 # Copyright (C) 2019, Mikolas Janota
-import sys,subprocess 
-from itertools import combinations
-
-solver = './cryptominisat5'
-
-def neg(l): return l[1:] if l[0] == '-' else '-'+l
-def var(l): return l[1:] if l[0] == '-' else l
-def sign(l): return l[0] == '-'
+import sys,os,signal,io,argparse,time,logging
+import multiprocessing
+from multiprocessing.connection import wait
+import cardinality, cnfcache
+try:
+    import numpy as np
+except ImportError: # the sample clauses are then built one by one
+    np = None
+from trees import Tree, greedy_tree, write_tree
+from clauses import Clauses
+from metrics import FamilyMetrics
+from samples import parse_lists, read_samples, load_samples, unique_rows
+from solvers import solver, make_backend, backends, UNKNOWN
+
+def neg(l): return -l
+def var(l): return abs(l)
+def sign(l): return l < 0
+log = logging.getLogger('loops_stub')
+DUMP = 5 # below DEBUG, dumps of the constraints and of the model
+logging.addLevelName(DUMP, 'DUMP')
+
+_structures = dict() # (input count, node count, amo, symmetry) -> (variable count, clauses of Enc.enc_structure)
+structures_kept = 16
+
+def _remember_structure(key, value):
+    if len(_structures) >= structures_kept:
+        del _structures[next(iter(_structures))] # the oldest one
+    _structures[key] = value
 
 class Enc:
-    def __init__(self, input_count,  node_count):
+    def __init__(self, input_count,  node_count, debug=False, amo='auto', symmetry=False, metrics=None):
          self.node_count = node_count
          self.input_count = input_count
-         self.constraints = []
-         self.fresh = 0
-
-    def x(self,i): return 'x_{}'.format(i)
-    def y(self,i): return 'y_{}'.format(i)
-    def v(self,i): return 'v_{}'.format(i) # 1 iff node i is a leaf node, i = 1, . . . , N
-    def l(self,i,j): return 'l_{}_{}'.format(i,j) # 1 iff node i has node j as the left child, with j ∈ LR (i)
-    def r(self,i,j): return 'r_{}_{}'.format(i,j) # 1 iff node i has node j as the right child, with j ∈ RR (i)
-    def p(self,j,i): return 'p_{}_{}'.format(i,j) # 1 iff the parent of node j is node i
-    def a(self,r,j): return 'a_{}_{}'.format(r,j)
-    def u(self,r,j): return 'u_{}_{}'.format(r,j)
-    def c(self,j): return 'c_{}'.format(j)
-    def d0(self,r,j): return 'd0_{}_{}'.format(r,j)
-    def d1(self,r,j): return 'd1_{}_{}'.format(r,j)
+         self.amo = amo # at-most-one encoding, see cardinality.encodings
+         self.symmetry = symmetry # add symmetry breaking constraints
+         self.constraints = Clauses()
+         self.debug = debug # keep names of fresh variables for debug output
+         self.fresh_names = dict()
+         self.and_gates = dict() # sorted operands -> output variable, kept while the structure is encoded
+         self.or_gates = dict()
+         self.metrics = metrics # a metrics.FamilyMetrics recording every constraint family
+         self.blocks = [] # (first id, last id, name) of each variable family
+         self.var_count = 0
+         self.v_base = self.mk_block('v', 1)
+         self.l_base = self.mk_block('l', node_count)
+         self.r_base = self.mk_block('r', node_count)
+         self.p_base = self.mk_block('p', node_count)
+         self.a_base = self.mk_block('a', input_count)
+         self.u_base = self.mk_block('u', input_count)
+         self.c_base = self.mk_block('c', 1)
+         self.d0_base = self.mk_block('d0', input_count)
+         self.d1_base = self.mk_block('d1', input_count)
+         # possible left and right children and parents of every node (index 0 unused)
+         N = node_count
+         self.lr = [[]] + [[j for j in range(i+1,min(2*i,N-1)+1) if j%2 == 0] for i in range(1,N+1)]
+         self.rr = [[]] + [[j for j in range(i+2,min(2*i+1,N)+1) if j%2 == 1] for i in range(1,N+1)]
+         self.lr_set = [set(js) for js in self.lr]
+         self.rr_set = [set(js) for js in self.rr]
+         self.parents = [[]] + [list(range(max(1,int(j/2)),j)) for j in range(1,N+1)]
+
+    def mk_block(self, nm, rows):
+        '''reserve rows*node_count consecutive ids for a variable family, returns the base'''
+        base = self.var_count
+        self.var_count += rows * self.node_count
+        self.blocks.append((base + 1, self.var_count, nm))
+        return base
+
+    # variables are integer ids, two-index families are stored row-wise with rows of length node_count
+    def v(self,i): return self.v_base + i # 1 iff node i is a leaf node, i = 1, . . . , N
+    def l(self,i,j): return self.l_base + (i-1)*self.node_count + j # 1 iff node i has node j as the left child, with j ∈ LR (i)
+    def r(self,i,j): return self.r_base + (i-1)*self.node_count + j # 1 iff node i has node j as the right child, with j ∈ RR (i)
+    def p(self,j,i): return self.p_base + (i-1)*self.node_count + j # 1 iff the parent of node j is node i
+    def a(self,r,j): return self.a_base + (r-1)*self.node_count + j
+    def u(self,r,j): return self.u_base + (r-1)*self.node_count + j
+    def c(self,j): return self.c_base + j
+    def d0(self,r,j): return self.d0_base + (r-1)*self.node_count + j
+    def d1(self,r,j): return self.d1_base + (r-1)*self.node_count + j
     def d(self,n,r,j):
         if n == 0:
             return self.d0(r,j)
         elif n == 1:
             return self.d1(r,j)
         else:
-            return ("Wrong feature value!!!!!")
-  
+            raise ValueError("Wrong feature value: {}".format(n))
+
+    def name(self, l):
+        '''human readable name of literal l, only meant for debug output'''
+        v = var(l)
+        pre = '-' if sign(l) else ''
+        for (first, last, nm) in self.blocks:
+            if first <= v <= last:
+                i, j = divmod(v - first, self.node_count)
+                if nm in ('v', 'c'):
+                    return '{}{}_{}'.format(pre, nm, j + 1)
+                return '{}{}_{}_{}'.format(pre, nm, i + 1, j + 1)
+        if v in self.fresh_names:
+            nm, ops = self.fresh_names[v]
+            return '{}_{}({})__{}'.format(pre, nm, ','.join(map(self.name, ops)), v)
+        return '{}_fresh__{}'.format(pre, v)
+
+    def tree_literals(self, t):
+        '''literals describing the tree t (see trees.py) as far as its nodes fit
+        into node_count, e.g. for solver phases'''
+        rv = []
+        for i in range(1, min(t.size, self.node_count) + 1):
+            if i in t.c:
+                rv.append(self.v(i))
+                rv.append(self.c(i) if t.c[i] else -self.c(i))
+            elif t.r[i] <= self.node_count:
+                rv.append(-self.v(i))
+                rv += [self.l(i, t.l[i]), self.r(i, t.r[i]), self.p(i, t.l[i]), self.p(i, t.r[i])]
+                rv += [self.a(k, i) if k == t.a[i] else -self.a(k, i) for k in range(1, self.input_count + 1)]
+        return rv
 
-    
+    def model_vars(self):
+        '''range of the variable ids a solver model has to keep: those of the
+        nodes, which decode looks at, or all of them in debug mode'''
+        return range(1, (self.var_count if self.debug else self.c_base + self.node_count) + 1)
+
+    def names(self):
+        '''side table mapping names to the ids of variables occurring in the constraints, built on demand'''
+        used = set(map(var, self.constraints.lits))
+        used.discard(0)
+        return dict((self.name(v), v) for v in sorted(used))
 
     def add_constraint(self, constraint):
         '''add constraints, which is a list of literals'''
         self.constraints.append(constraint)
 
 
-    def mk_fresh(self, nm):
-        '''make fresh variable'''
-        self.fresh = self.fresh + 1
-        return '_' + nm + '__' + str(self.fresh)
+    def mk_fresh(self, nm, *ops):
+        '''make fresh variable, its name is only recorded in debug mode'''
+        self.var_count = self.var_count + 1
+        if self.debug:
+            self.fresh_names[self.var_count] = (nm, ops)
+        return self.var_count
 
     def mk_and(self, l1, l2):
-        '''encode and between l1 and l2 by introducing a fresh variable'''
-        r = self.mk_fresh(l1+'_and_'+l2)
+        '''encode and between l1 and l2 by introducing a fresh variable, unless
+        the same gate was made before'''
+        if l1 == l2: return l1
+        key = (l1, l2) if l1 < l2 else (l2, l1)
+        r = self.and_gates.get(key)
+        if r is not None: return r
+        r = self.and_gates[key] = self.mk_fresh('and', l1, l2)
         self.constraints.append([neg(l1), neg(l2), r])
         self.constraints.append([l1, neg(r)])
         self.constraints.append([l2, neg(r)])
@@ -66,12 +160,16 @@ class Enc:
         
     def add_atmost_one(self,l):
         '''add constrains to satisfy at most one for list l'''
-        for x,y in combinations(l,2):
-            self.add_constraint([neg(x),neg(y)])
-
-    def mk_OR(self, l): # takes a list of clauses
-        '''encode and between l1 and l2 by introducing a fresh variable'''
-        r = self.mk_fresh('_OR_'.join(l))
+        cardinality.atmost_one(self, l, self.amo)
+
+    def mk_OR(self, l): # takes a list of literals
+        '''encode or over the literals l by introducing a fresh variable, unless
+        the same gate was made before or l has only one literal'''
+        if len(l) == 1: return l[0]
+        key = tuple(sorted(l))
+        r = self.or_gates.get(key)
+        if r is not None: return r
+        r = self.or_gates[key] = self.mk_fresh('OR', *l)
         for clause in l:
             self.add_constraint([neg(clause), r])
 
@@ -79,99 +177,155 @@ class Enc:
         return r
         
 
-    def print_model(self,model):
-        '''prints SAT model, eventually should print the decision tree'''
-        print('# === model')
-        for str_var in sorted(self.var_map.keys()):
-            v = self.var_map[str_var]
-            val = '?'
-            if v in model and model[v]: val='T'
-            if v in model and not model[v]: val='F'
-            print('# {}={} ({})'.format(str_var,val,v))
-        print('# === end of model')
+    def decode(self, model):
+        '''read the tree from the model, only the variables of the nodes are looked at'''
+        val = lambda v: model.get(v, False)
+        N = self.node_count
+        l, r, a, c = dict(), dict(), dict(), dict()
+        for i in range(1, N + 1):
+            if val(self.v(i)):
+                c[i] = 1 if val(self.c(i)) else 0
+                continue
+            for j in range(i+1 + (i+1)%2, min(2*i, N-1)+1, 2): # LR(i)
+                if val(self.l(i,j)):
+                    l[i], r[i] = j, j + 1
+                    break
+            for k in range(1, self.input_count + 1):
+                if val(self.a(k,i)):
+                    a[i] = k
+                    break
+        return Tree(N, l, r, a, c)
+
+    def print_model(self,model,features=None):
+        '''prints SAT model, eventually should print the decision tree,
+        features maps feature k to features[k-1] in the printed tree'''
+        if log.isEnabledFor(DUMP):
+            var_map = self.names()
+            log.log(DUMP, '=== model')
+            for str_var in sorted(var_map.keys()):
+                v = var_map[str_var]
+                val = '?'
+                if v in model and model[v]: val='T'
+                if v in model and not model[v]: val='F'
+                log.log(DUMP, '{}={} ({})'.format(str_var,val,v))
+            log.log(DUMP, '=== end of model')
         print("START TREE")
-        for str_var in sorted(self.var_map.keys()):
-            v = self.var_map[str_var]
-            if str_var[0] in 'lra' and model[v]:
-                name = str_var.split("_")
-                print(name[0], name[1], name[2])
-            elif str_var[0]=='c':
-                name = str_var.split("_")
-                node = name[1]
-                leaf = self.var_map["v_" + node]
-                if leaf in model and model[leaf]:
-                    result = 1 if model[v] else 0
-                    print(name[0], name[1], result)
+        write_tree(self.decode(model), sys.stdout, features)
         print('# === tree (TODO)')
         print('# === end of tree')
 
 
-    def mk_cnf(self,print_comments):
-        '''encode constraints as CNF in DIMACS'''
-        maxid = 0
-        self.var_map = dict()
-        cs = 0
-        rv = ''
+    def cnf_chunks(self, assumptions=()):
+        '''yields the constraints as CNF in DIMACS in strings that are formatted
+        when they are taken, assumptions are added as unit clauses'''
+        yield 'p cnf {} {}\n'.format(self.var_count, len(self.constraints) + len(assumptions))
+        yield from self.constraints.chunks()
+        if assumptions: yield ''.join('{} 0\n'.format(l) for l in assumptions)
+
+    def write_cnf(self, out, print_comments=False, assumptions=()):
+        '''stream constraints as CNF in DIMACS into the text stream out,
+        assumptions are added as unit clauses'''
+        if not print_comments:
+            for s in self.cnf_chunks(assumptions):
+                out.write(s)
+            return
+        out.write('p cnf {} {}\n'.format(self.var_count, len(self.constraints) + len(assumptions)))
         for c in self.constraints:
-            if not isinstance(c, list): continue
-            cs = cs + 1
-            for l in c:
-                if var(l) not in self.var_map:
-                    maxid = maxid + 1
-                    self.var_map[var(l)] = maxid
-
-        rv += 'p cnf {} {}'.format(len(self.var_map), cs) + '\n'
-        for c in self.constraints:
-            if isinstance(c, list):
-                if print_comments:
-                    rv += 'c ' + str(c) + '\n'
-                rv += ' '.join(map(str,[ -(self.var_map[var(l)]) if sign(l) else self.var_map[l] for l in c])) + ' 0\n'
-            else:
-                if print_comments:
-                    rv += 'c ' + str(c) + '\n'
+            out.write('c ' + str([self.name(l) for l in c]) + '\n')
+            out.write(' '.join(map(str, c)) + ' 0\n')
+        for l in assumptions:
+            out.write('{} 0\n'.format(l))
 
-        return rv
-
-    def enc(self, samples):
-        '''encode the problem'''
-        def LR(i):
-            return [j for j in range(i+1,min(2*i,self.node_count-1)+1) if j%2 == 0]
-        def RR(i):
-            return [j for j in range(i+2,min(2*i+1,self.node_count)+1) if j%2 == 1]
+    def mk_cnf(self,print_comments):
+        '''encode constraints as CNF in DIMACS'''
+        rv = io.StringIO()
+        self.write_cnf(rv, print_comments)
+        return rv.getvalue()
+
+    def enc(self, samples, cache=None):
+        '''encode the problem, the part not depending on the samples is shared
+        by encoders of the same size and options (and stored in cache if given)'''
+        self.enc_structure(cache)
+        self.enc_samples(samples)
+        if self.metrics is not None: self.metrics.finish(self)
+
+    def mark(self, name):
+        '''start the constraint family name, only used by the metrics'''
+        if self.metrics is not None: self.metrics.mark(self, name)
+
+    def enc_structure(self, cache=None):
+        '''add the constraints (1)-(11) and (14), which only depend on the
+        numbers of nodes and features, from the memo, from cache or by encoding them'''
+        key = (self.input_count, self.node_count, self.amo, self.symmetry)
+        shared = not self.debug and self.metrics is None # memoized clauses come without names of fresh variables and metrics
+        if shared:
+            hit = _structures.get(key)
+            if hit is None and cache is not None:
+                hit = cache.get(cache.structure_key(*key))
+                if hit: _remember_structure(key, hit)
+            if hit:
+                self.var_count, cs = hit
+                self.constraints.extend(cs)
+                return
+        assert not self.constraints
+        self._enc_structure()
+        # memoized structures come without gates, so none are shared with later constraints
+        self.and_gates.clear()
+        self.or_gates.clear()
+        if shared:
+            _remember_structure(key, (self.var_count, self.constraints.copy()))
+            if cache is not None: cache.put(cache.structure_key(*key), self.var_count, self.constraints)
+
+    def _enc_structure(self):
 
         #Constrains for binary tree
         #(1) the root node is not a leaf
+        self.mark('1')
         self.add_constraint([neg(self.v(1))])
         
         #(2) If a node is a leaf node, then it has no children:
+        self.mark('2')
         for i in range(1,self.node_count+1):
-            for j in LR(i):
+            for j in self.lr[i]:
                 self.add_constraint([neg(self.v(i)),neg(self.l(i,j))])
 
         #(3) The left child and the right child of the ith node are numbered consecutively
+        self.mark('3')
         for i in range(1,self.node_count+1):
-            for j in LR(i):
+            for j in self.lr[i]:
                 self.add_iff(self.l(i,j),self.r(i,j+1))
                     
         #(4) An internal node must have a child.
+        self.mark('4')
         for i in range(1,self.node_count+1):
-            self.add_atmost_one([self.l(i,j) for j in LR(i)])
-            self.add_constraint([self.l(i,j) for j in LR(i)]+[self.v(i)]) # at least one constraint
+            self.add_atmost_one([self.l(i,j) for j in self.lr[i]])
+            self.add_constraint([self.l(i,j) for j in self.lr[i]]+[self.v(i)]) # at least one constraint
 
 
         #(5) If the i-th node is a parent then it must have a child
+        self.mark('5')
         for i in range(1,self.node_count+1):
-            for j in LR(i):    
+            for j in self.lr[i]:    
                 self.add_iff(self.p(i,j),self.l(i,j))
-            for j in RR(i):
+            for j in self.rr[i]:
                 self.add_iff(self.p(i,j),self.r(i,j))
                 
         #(6) The binary tree must be a tree. Hence, all nodes but the first must have a parent:
+        self.mark('6')
         for j in range(2,self.node_count+1):
             P = [self.p(i,j) for i in range(int(j/2),min(j-1,self.node_count)+1)]
             self.add_atmost_one(P)
             self.add_constraint(P)
 
+        #(6.1) optional symmetry breaking, nodes are numbered in BFS order:
+        # the parents of consecutive left children are increasing
+        if self.symmetry:
+            self.mark('6.1')
+            for j in range(2, self.node_count-1, 2):
+                for i in range(int(j/2), j):
+                    for i2 in range(int(j/2)+1, i+1):
+                        self.add_constraint([neg(self.p(i,j)),neg(self.p(i2,j+2))])
+
 
                 
         #Constrains for features
@@ -183,7 +337,7 @@ class Enc:
                 list_j = []
                 for i in range(int(j/2), j):
                     list_j.append(self.mk_and(self.p(i,j),self.d0(k,i)))
-                    if j in RR(i):
+                    if j in self.rr_set[i]:
                         list_j.append(self.mk_and(self.a(k,i),self.r(i,j)))
 
                 self.add_constraint(self.add_iff(self.d0(k,j), list_j))
@@ -192,13 +346,14 @@ class Enc:
 
 
         #(7)
+        self.mark('7')
         for k in range(1,self.input_count+1):
             self.add_constraint([neg(self.d0(k,1))])
             for j in range(2,self.node_count+1):
                 list_j = []
-                for i in range(int(j/2),j): # create list for making the big OR over
+                for i in self.parents[j]: # create list for making the big OR over
                     list_j.append(self.mk_and(self.p(i,j),self.d0(k,i)))
-                    if j in RR(i):
+                    if j in self.rr_set[i]:
                         list_j.append(self.mk_and(self.a(k, i), self.r(i, j)))
 
                 self.add_iff(self.d0(k,j), self.mk_OR(list_j))
@@ -206,20 +361,21 @@ class Enc:
                 """
                 self.add_constraint([neg(self.d0(k,i))]+list_j)
                 
-                for i in range(int(j/2),j): #left implication
+                for i in self.parents[j]: #left implication
                     self.add_constraint([neg(self.p(i,j)),neg(self.d0(k,i)),self.d0(k,j)])
-                    if j in RR(i):
+                    if j in self.rr_set[i]:
                         self.add_constraint([neg(self.a(k,i)),neg(self.r(i,j)),self.d0(k,j)])
                 """
 
         #(8)
+        self.mark('8')
         for k in range(1,self.input_count+1):
             self.add_constraint([neg(self.d1(k,1))])
             for j in range(2,self.node_count+1):
                 list_j = []
-                for i in range(int(j/2),j): #right implicaton
+                for i in self.parents[j]: #right implicaton
                     list_j.append(self.mk_and(self.p(i,j),self.d1(k,i)))
-                    if j in LR(i):
+                    if j in self.lr_set[i]:
                         list_j.append(self.mk_and(self.a(k,i),self.l(i,j)))
 
                 self.add_iff(self.d1(k, j), self.mk_OR(list_j))
@@ -227,59 +383,87 @@ class Enc:
                 """
                 self.add_constraint([neg(self.d1(k,i))]+list_j)
 
-                for i in range(int(j/2),j): #left implication
+                for i in self.parents[j]: #left implication
                     self.add_constraint([neg(self.p(i,j)),neg(self.d1(k,i)),self.d1(k,j)])
-                    if j in LR(i):
+                    if j in self.lr_set[i]:
                         self.add_constraint([neg(self.a(k,i)),neg(self.l(i,j)),self.d1(k,j)])
                 """
 
         #(9.1)
+        self.mark('9.1')
         for k in range(1,self.input_count+1):
             for j in range(1, self.node_count+1):
-                for i in range(max(1,int(j/2)),j): ####is the begining of range ok???
+                for i in self.parents[j]: ####is the begining of range ok???
                     self.add_constraint([neg(self.u(k,i)),neg(self.p(i,j)),neg(self.a(k,j))])
 
         #(9.2)
+        self.mark('9.2')
         for k in range(1,self.input_count+1):
             for j in range(1, self.node_count+1):
-                self.add_constraint([neg(self.u(k,j)),self.a(k,j)] + [self.mk_and(self.u(k,i),self.p(i,j)) for i in range(max(1,int(j/2)),j)]) #right implication
+                self.add_constraint([neg(self.u(k,j)),self.a(k,j)] + [self.mk_and(self.u(k,i),self.p(i,j)) for i in self.parents[j]]) #right implication
 
                 self.add_constraint([self.u(k,j),neg(self.a(k,j))]) #left implication
-                for i in range(max(1,int(j/2)),j): #left implication
+                for i in self.parents[j]: #left implication
                     self.add_constraint([self.u(k,j),neg(self.u(k,i)),neg(self.p(i,j))])
 
 
         #(10)
+        self.mark('10')
         for j in range(1, self.node_count+1):
             self.add_atmost_one([self.a(k,j) for k in range(1,self.input_count+1)])
             self.add_constraint([self.a(k,j) for k in range(1,self.input_count+1)]+[self.v(j)])
 
         #(11)
+        self.mark('11')
         for k in range(1,self.input_count+1):
             for j in range(1, self.node_count+1):
                 self.add_constraint([neg(self.v(j)),neg(self.a(k,j))])
 
+        #(14 haha) - not existing l_ij and r_ij are false!
+        self.mark('14')
+        for i in range(1, self.node_count+1):
+            for j in self.rr[i]:
+                self.add_constraint([neg(self.l(i,j))])
+            for j in self.lr[i]:
+                self.add_constraint([neg(self.r(i,j))])
+
+    def enc_samples(self, samples):
+        '''add the constraints (12) and (13) of the samples'''
+        if np is not None and len(samples):
+            m = np.asarray(samples, dtype=np.int64)
+            if ((m[:, :self.input_count] != 0) & (m[:, :self.input_count] != 1)).any():
+                raise ValueError("Wrong feature value in samples")
+            for cls in (1, 0):
+                self.mark('12' if cls else '13')
+                self.constraints.extend_rows(self.sample_clauses(m[m[:, -1] == cls], cls))
+            return
+
         #(12)
+        self.mark('12')
         for example in samples:
             if example[-1] == 1:
                 for j in range(1,self.node_count+1):
                     self.add_constraint([neg(self.v(j)),self.c(j)]+[self.d(example[k],k+1,j) for k in range(self.input_count)])
 
         #(13)
+        self.mark('13')
         for example in samples:
             if example[-1] == 0:
                 for j in range(1,self.node_count+1):
                     self.add_constraint([neg(self.v(j)),neg(self.c(j))]+[self.d(example[k],k+1,j) for k in range(self.input_count)])
 
-        
-        #(14 haha) - not existing l_ij and r_ij are false!
-        for i in range(1, self.node_count+1):
-            for j in RR(i):
-                self.add_constraint([neg(self.l(i,j))])
-            for j in LR(i):
-                self.add_constraint([neg(self.r(i,j))])
+    def sample_clauses(self, m, cls):
+        '''clauses (12) (cls 1) or (13) (cls 0) for the samples in the rows of the
+        integer matrix m as an integer array with one row per sample and node'''
+        N, K = self.node_count, self.input_count
+        j = np.arange(1, N+1)
+        d = np.where(m[:, :K] == 0, self.d0_base, self.d1_base) + np.arange(K) * N # d(x_k,k,j) - j
+        rv = np.empty((len(m), N, K + 2), dtype=np.int64)
+        rv[:, :, 0] = -(self.v_base + j)
+        rv[:, :, 1] = (self.c_base + j) if cls else -(self.c_base + j)
+        rv[:, :, 2:] = d[:, None, :] + j[None, :, None]
+        return rv.reshape(-1, K + 2)
 
-     
 #        # -x1 | -x2
 #        self.add_constraint([neg(self.x(1)), neg(self.x(2))])
 #        # x1 | x2
@@ -292,58 +476,328 @@ class Enc:
 #        self.add_constraint([neg(self.y(1))])
 #        """
         
-def get_model(lns):
-    vals=dict()
-    found=False
-    for l in lns:
-        l=l.rstrip()
-        if not l: continue
-        if not l.startswith('v ') and not l.startswith('V '): continue
-        found=True
-        vs = l.split()[1:]
-        for v in vs:
-            if v == '0': break
-            vals[int(var(v))] = not sign(v)
-    return vals if found else None
-
 def parse(f):
-    nms = None
-    samples = []
-    for l in f:
-        s = l.rstrip().split()
-        if not s: continue
-        if nms:
-            samples.append([int(l) for l in s])
-        else:
-            nms = [int(l) for l in s]
-    return (nms, samples)
-
+    return parse_lists(f)
+
+def dedup(samples):
+    '''drop repeated samples, returns the remaining samples and whether two
+    samples have the same features but different classes (then no tree exists);
+    a matrix of samples stays a matrix'''
+    if np is not None and isinstance(samples, np.ndarray):
+        if not len(samples): return samples, False
+        rows = samples[np.sort(unique_rows(samples)[1])]
+        return rows, len(unique_rows(rows[:, :-1])[0]) < len(rows)
+    classes = dict()
+    rv = []
+    for s in samples:
+        f = tuple(s[:-1])
+        if f in classes:
+            if classes[f] != s[-1]: return rv, True
+            continue
+        classes[f] = s[-1]
+        rv.append(s)
+    return rv, False
+
+def reduce_features(input_count, samples):
+    '''drop constant feature columns and columns equal or complementary to an
+    earlier one; a tree of minimal size never needs them, but at a larger fixed
+    size they may be needed to fill up the tree. Returns the samples over the
+    remaining features and the original index of every remaining feature.'''
+    if not len(samples): return samples, list(range(1, input_count + 1))
+    matrix = np is not None and isinstance(samples, np.ndarray)
+    if matrix:
+        cols = list(map(tuple, samples[:, :input_count].T.tolist()))
+    else:
+        cols = [tuple(s[k] for s in samples) for k in range(input_count)]
+    seen = set()
+    keep = []
+    for k, col in enumerate(cols):
+        if len(set(col)) == 1: continue
+        if col in seen or tuple(1 - x for x in col) in seen: continue
+        seen.add(col)
+        keep.append(k)
+    if not keep: keep = [0] # the root must still split on something
+    if matrix:
+        return samples[:, keep + [samples.shape[1] - 1]], [k + 1 for k in keep]
+    return [[s[k] for k in keep] + [s[-1]] for s in samples], [k + 1 for k in keep]
+
+def encode(input_count, node_count, samples, opts=None, cache=None, metrics=None):
+    '''encoder for a tree with node_count nodes, opts are keyword options of Enc;
+    the clauses are taken from and stored into the CNF cache if given, unless
+    the encoding is measured by metrics (see metrics.py)'''
+    opts = opts or {}
+    e = Enc(input_count, node_count, metrics=metrics, **opts)
+    key = None
+    if cache is not None and not e.debug and metrics is None: # cached clauses come without names of fresh variables
+        key = cache.key(input_count, node_count, samples, opts)
+        hit = cache.get(key)
+        if hit:
+            e.var_count, e.constraints = hit
+            return e
+    e.enc(samples, cache)
+    if key: cache.put(key, e.var_count, e.constraints)
+    return e
+
+def solve(input_count, node_count, samples, opts=None, backend=None, hint=None, cache=None):
+    '''encode and solve for a tree with node_count nodes using the solver backend
+    (see solvers.py), opts and cache are as for encode and the tree hint gives
+    the preferred phases of the solver.
+    Returns the encoder, the solver exit code (10, 20 or UNKNOWN if the backend
+    hit a limit) and the model (None unless SAT)'''
+    e = encode(input_count, node_count, samples, opts, cache)
+    rc, model = (backend or make_backend()).solve(e, phases=e.tree_literals(hint) if hint else ())
+    if rc not in (10, 20, UNKNOWN):
+        raise RuntimeError("something went wrong with the solver (exit code {})".format(rc))
+    return e, rc, model
+
+def size_bound(input_count, samples):
+    '''odd tree size that is always enough for consistent samples: one leaf per
+    sample and no more leaves than the complete tree over all features'''
+    leaves = min(max(2, len(samples)), 2 ** min(input_count, 30))
+    return 2 * leaves - 1
+
+def _solve_job(conn, input_count, node_count, samples, opts, backend, hint, cache, timeout, mem_limit, stats):
+    '''worker of parallel_minimize, runs in its own process group so that
+    killing the group also kills the solver'''
+    os.setpgrp()
+    t0 = time.perf_counter()
+    _, rc, model = solve(input_count, node_count, samples, opts, make_backend(backend, timeout, mem_limit, stats), hint, cache)
+    conn.send((rc, model, time.perf_counter() - t0))
+    conn.close()
+
+def _kill_job(p):
+    try:
+        os.killpg(p.pid, signal.SIGKILL)
+    except ProcessLookupError: # the worker did not make its group yet
+        p.kill()
+    p.join()
+
+def parallel_minimize(input_count, samples, sizes, opts=None, jobs=None, log=None, backend='auto', hint=None, cache=None,
+                      timeout=None, mem_limit=None, stats=None):
+    '''solve several sizes at once, sizes are tried from the smallest one. A SAT
+    answer at n cancels the jobs of larger sizes, an UNSAT answer at n cancels
+    the jobs of smaller sizes, so the result is the same as of the sequential
+    search. Returns the same as minimize.'''
+    jobs = jobs or os.cpu_count()
+    sat, unsat = None, 0 # smallest SAT size and largest UNSAT size found so far
+    todo = list(sizes)
+    running = dict() # connection -> (size, process)
+    steps = []
+    best = (None, None)
+    def cancel(keep):
+        for conn, (n, p) in list(running.items()):
+            if not keep(n):
+                _kill_job(p)
+                del running[conn]
+                if log: log(n, None, None)
+    try:
+        while True:
+            todo = [n for n in todo if unsat < n and (sat is None or n < sat)]
+            while todo and len(running) < jobs:
+                n = todo.pop(0)
+                recv, send = multiprocessing.Pipe(False)
+                p = multiprocessing.Process(target=_solve_job, args=(send, input_count, n, samples, opts, backend, hint, cache, timeout, mem_limit, stats))
+                p.start()
+                send.close()
+                running[recv] = (n, p)
+            if not running: break
+            for conn in wait(list(running)):
+                if conn not in running: continue # cancelled by an earlier answer
+                n, p = running.pop(conn)
+                try:
+                    rc, model, t = conn.recv()
+                except EOFError:
+                    raise RuntimeError("solving size {} failed".format(n))
+                p.join()
+                steps.append((n, rc, t))
+                if log: log(n, rc, t)
+                if rc == 10:
+                    sat, best = n, (n, model)
+                    cancel(lambda m: m < n)
+                elif rc == 20:
+                    unsat = max(unsat, n)
+                    cancel(lambda m: m > n)
+    finally:
+        cancel(lambda m: False)
+    n, model = best
+    e = None
+    if n is not None: # encoding is deterministic, the model of the worker fits a fresh encoder
+        e = encode(input_count, n, samples, opts, cache)
+    return n, e, model, steps
+
+def minimize(input_count, samples, strategy='up', hi=None, opts=None, log=None, jobs=None, backend='auto', hint=None, cache=None,
+             timeout=None, mem_limit=None, stats=None):
+    '''search for the smallest odd tree size with a consistent tree, the samples are
+    parsed once and reused for every size; strategy is 'up', 'down', 'binary'
+    or 'parallel' (see parallel_minimize, which runs up to jobs solvers at once),
+    opts and cache are as for encode, backend is the kind of solver backend and
+    timeout, mem_limit and stats are its options (see make_backend), the limits are per size.
+    A consistent tree hint bounds the search by its size and gives the solver phases.
+    Returns (size, encoder, model, steps), size is None if no size up to hi works,
+    steps lists (size, solver exit code, seconds) in the order they were tried.
+    Sizes with exit code UNKNOWN count as not SAT, so the size is only known
+    to be minimal if no step is UNKNOWN.'''
+    if hi is None: hi = size_bound(input_count, samples)
+    if hint: hi = min(hi, hint.size)
+    sizes = list(range(3, hi + 1, 2)) # the root is never a leaf, so 3 is the smallest size
+    if strategy == 'parallel':
+        return parallel_minimize(input_count, samples, sizes, opts, jobs, log, backend, hint, cache, timeout, mem_limit, stats)
+    sat = make_backend(backend, timeout, mem_limit, stats)
+    steps = []
+    best = (None, None, None)
+    def attempt(n):
+        nonlocal best
+        t0 = time.perf_counter()
+        e, rc, model = solve(input_count, n, samples, opts, sat, hint, cache)
+        steps.append((n, rc, time.perf_counter() - t0))
+        if log: log(*steps[-1])
+        if rc == 10 and (best[0] is None or n < best[0]):
+            best = (n, e, model)
+        return rc == 10
+
+    if strategy == 'up':
+        for n in sizes:
+            if attempt(n): break
+    elif strategy == 'down':
+        for n in reversed(sizes):
+            if not attempt(n): break
+    elif strategy == 'binary':
+        lo, up = 0, len(sizes) # first SAT size index is in [lo, up], up meaning none
+        while lo < up:
+            mid = (lo + up) // 2
+            if attempt(sizes[mid]): up = mid
+            else: lo = mid + 1
+    else:
+        raise ValueError("unknown search strategy: {}".format(strategy))
+    return best + (steps,)
 
 
 if __name__ == "__main__":
-    debug_solver = False 
-
-    print("# reading from stdin")
-    nms, samples = parse(sys.stdin)
-    print("# encoding")
-    e = Enc(nms[0], nms[1])
-    e.enc(samples)
-    print("# encoded constraints")
-    print("# " + "\n# ".join(map(str, e.constraints)))
-    print("# END encoded constraints")
-    print("# sending to solver '" + solver + "'")
-    cnf = e.mk_cnf(False)
-    p = subprocess.Popen(solver, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    (po, pe) = p.communicate(input=bytes(cnf, encoding ='utf-8'))
-    if debug_solver:
-        print('\n'.join(lns), file=sys.stderr)
-        print(cnf, file=sys.stderr)
-    print("# decoding result from solver")
-    rc = p.returncode
-    lns = str(po, encoding ='utf-8').splitlines()
+    ap = argparse.ArgumentParser(description='Find a decision tree of given size for samples read from stdin.')
+    ap.add_argument('samples', nargs='?', help='read the samples from this file (and its binary cache) instead of stdin')
+    ap.add_argument('--amo', choices=['auto'] + sorted(cardinality.encodings), default='auto',
+                    help='at-most-one encoding (default: %(default)s)')
+    ap.add_argument('--symmetry', action='store_true', help='add symmetry breaking constraints (BFS numbering of nodes)')
+    ap.add_argument('--minimize', choices=['up', 'down', 'binary', 'parallel'],
+                    help='ignore the size in the header and search for the smallest tree over odd sizes')
+    ap.add_argument('--jobs', type=int, help='number of sizes solved at once by --minimize parallel (default: all cores)')
+    ap.add_argument('--max-size', type=int, metavar='N', help='largest size tried by --minimize')
+    ap.add_argument('--reduce', action='store_true',
+                    help='with --minimize, drop constant and duplicate features, which keeps the minimal size')
+    ap.add_argument('--no-greedy', action='store_true',
+                    help='do not build a greedy tree for the size bound and the solver phases')
+    ap.add_argument('--backend', choices=backends, default='auto',
+                    help="solver backend, 'auto' prefers an installed python SAT binding over '" + solver + "', 'portfolio' races several solver configurations")
+    ap.add_argument('--timeout', type=float, metavar='SEC',
+                    help="stop the solver after SEC seconds (per size with --minimize) and answer UNKNOWN, uses '" + solver + "'")
+    ap.add_argument('--mem-limit', type=int, metavar='MB', help='memory limit of the solver, as --timeout')
+    ap.add_argument('--portfolio-stats', metavar='FILE',
+                    help='append the winning configurations of --backend portfolio to FILE as JSON lines')
+    ap.add_argument('--cache', action='store_true', help='reuse CNFs from the on-disk cache')
+    ap.add_argument('--cache-dir', metavar='DIR',
+                    help='directory of the CNF cache, implies --cache (default: %s)' % cnfcache.default_dir)
+    ap.add_argument('--cache-size', type=int, default=1024, metavar='MB',
+                    help='size limit of the CNF cache (default: %(default)s)')
+    ap.add_argument('--cnf', metavar='FILE', help='write the CNF into FILE instead of calling the solver')
+    ap.add_argument('--metrics', metavar='FILE',
+                    help='write clauses, fresh variables, time and memory of every constraint family as JSON into FILE')
+    vg = ap.add_mutually_exclusive_group()
+    vg.add_argument('-q', '--quiet', action='store_const', dest='level', const=logging.WARNING,
+                    help='print only the result')
+    vg.add_argument('-v', '--verbose', action='store_const', dest='level', const=logging.DEBUG,
+                    help='also print sizes and other details')
+    vg.add_argument('--debug', action='store_const', dest='level', const=DUMP,
+                    help='also dump the constraints, the model and the CNF (to stderr)')
+    ap.set_defaults(level=logging.INFO)
+    args = ap.parse_args()
+    if args.metrics and args.minimize:
+        ap.error('--metrics needs a fixed size')
+    if args.reduce and not args.minimize:
+        ap.error('--reduce needs --minimize, at a fixed size the dropped features may be needed')
+    if args.backend == 'incremental' and (args.timeout is not None or args.mem_limit is not None):
+        ap.error('--timeout and --mem-limit need the subprocess backend')
+    handler = logging.StreamHandler(sys.stdout) # comments, ignored by chk.py
+    handler.setFormatter(logging.Formatter('# %(message)s'))
+    log.addHandler(handler)
+    log.setLevel(args.level)
+    debug = args.level <= DUMP
+
+    if args.samples:
+        log.info("reading from " + args.samples)
+        nms, samples = load_samples(args.samples)
+    else:
+        log.info("reading from stdin")
+        nms, samples = read_samples(sys.stdin.buffer)
+    log.debug("{} features, {} nodes, {} samples".format(nms[0], nms[1], len(samples)))
+    samples, conflict = dedup(samples)
+    if conflict:
+        log.info("samples with equal features and different classes")
+        print("UNSAT")
+        sys.exit(0)
+    input_count, features = nms[0], None
+    if args.reduce:
+        samples, features = reduce_features(input_count, samples)
+        input_count = len(features)
+        log.info("using {} of {} features".format(input_count, nms[0]))
+    opts = dict(amo=args.amo, symmetry=args.symmetry, debug=debug)
+    mem_limit = args.mem_limit << 20 if args.mem_limit else None
+    cache = None
+    if args.cache or args.cache_dir:
+        cache = cnfcache.CnfCache(args.cache_dir or cnfcache.default_dir, args.cache_size << 20)
+    hint = None
+    if not args.no_greedy:
+        hint = greedy_tree(input_count, samples)
+        if hint: log.info("greedy tree of size {}".format(hint.size))
+    if args.minimize:
+        def log_step(n, rc, t):
+            if rc is None: log.info("size {}: cancelled".format(n))
+            else: log.info("size {}: {} in {:.3f}s".format(n, {10: 'SAT', 20: 'UNSAT'}.get(rc, 'UNKNOWN'), t))
+        t0 = time.perf_counter()
+        n, e, model, steps = minimize(input_count, samples, args.minimize, args.max_size, opts, log_step, args.jobs, args.backend,
+                                      hint, cache, args.timeout, mem_limit, args.portfolio_stats)
+        log.info("total search time {:.3f}s".format(time.perf_counter() - t0))
+        unknown = any(rc == UNKNOWN for (_, rc, _) in steps)
+        if unknown and n is not None:
+            log.warning("some sizes hit a limit, the size may not be minimal")
+        if n is None:
+            print("UNKNOWN" if unknown else "UNSAT")
+        else:
+            log.info("minimal size {}".format(n))
+            e.print_model(model, features)
+        sys.exit(0)
+    log.info("encoding")
+    metrics = FamilyMetrics() if args.metrics else None
+    e = encode(input_count, nms[1], samples, opts, cache, metrics)
+    log.debug("{} variables, {} clauses".format(e.var_count, len(e.constraints)))
+    if metrics:
+        with open(args.metrics, 'w') as f:
+            metrics.dump(f)
+        for t in metrics.totals():
+            log.debug("family {family}: {clauses} clauses, {fresh_vars} fresh variables, {time:.3f}s, {peak_bytes} bytes".format(**t))
+    if log.isEnabledFor(DUMP):
+        log.log(DUMP, "encoded constraints")
+        for c in e.constraints:
+            log.log(DUMP, str([e.name(l) for l in c]))
+        log.log(DUMP, "END encoded constraints")
+    if args.cnf:
+        with open(args.cnf, 'w') as f:
+            e.write_cnf(f)
+        log.info("CNF written to '" + args.cnf + "'")
+        sys.exit(0)
+    sat = make_backend(args.backend, args.timeout, mem_limit, args.portfolio_stats)
+    log.info("sending to solver " + type(sat).__name__)
+    rc, model = sat.solve(e, phases=e.tree_literals(hint) if hint else ())
+    for (nm, _, t) in getattr(sat, 'wins', ()):
+        log.info("answer of configuration {} after {:.3f}s".format(nm, t))
+    if debug:
+        e.write_cnf(sys.stderr, True)
+    log.info("decoding result from solver")
     if rc == 10:
-        e.print_model(get_model(lns))
+        e.print_model(model, features)
     elif rc == 20:
         print("UNSAT")
+    elif rc == UNKNOWN:
+        log.info("the solver hit a limit")
+        print("UNKNOWN")
     else:
         print("ERROR: something went wrong with the solver")
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# File:  metrics.py
+# Created on:  Sun Oct 18 12:03:40 UTC 2026
+'''Per constraint family metrics of Enc.
+
+An Enc given a FamilyMetrics calls mark(e, name) when it starts a family
+(1)-(14) and finish(e) when the encoding is done. Every family then gets a
+record with the clauses and the fresh variables it added, the seconds it
+took and, with memory, the peak of memory traced by tracemalloc above the
+memory at its start. Records go to the callback and into records, from which
+totals sums them per family and dump writes JSON. Without a FamilyMetrics Enc
+only pays a test per family.
+'''
+import time, json, tracemalloc
+
+class FamilyMetrics:
+    def __init__(self, callback=None, memory=True):
+        self.callback = callback
+        self.memory = memory # tracing slows encoding down several times
+        self.records = []
+        self.current = None # (name, clauses, variables, time, traced memory) at the start of the family
+        self.tracing = False # whether tracemalloc was started here
+
+    def mark(self, e, name):
+        '''close the current family of e and start the family name'''
+        self.close(e)
+        mem = 0
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.tracing = True
+            tracemalloc.reset_peak()
+            mem = tracemalloc.get_traced_memory()[0]
+        self.current = (name, len(e.constraints), e.var_count, time.perf_counter(), mem)
+
+    def close(self, e):
+        if self.current is None: return
+        t = time.perf_counter()
+        name, clauses, var_count, t0, mem = self.current
+        self.current = None
+        rec = dict(family=name, features=e.input_count, nodes=e.node_count,
+                   clauses=len(e.constraints) - clauses, fresh_vars=e.var_count - var_count, time=t - t0)
+        if self.memory: rec['peak_bytes'] = tracemalloc.get_traced_memory()[1] - mem
+        self.records.append(rec)
+        if self.callback: self.callback(rec)
+
+    def finish(self, e):
+        '''close the last family of e'''
+        self.close(e)
+        if self.tracing:
+            tracemalloc.stop()
+            self.tracing = False
+
+    def totals(self):
+        '''the records summed per family in the order families first occurred,
+        the peak is the largest one'''
+        rv = dict()
+        for r in self.records:
+            t = rv.setdefault(r['family'], dict(family=r['family'], encodings=0, clauses=0, fresh_vars=0, time=0.0))
+            t['encodings'] += 1
+            for k in ('clauses', 'fresh_vars', 'time'):
+                t[k] += r[k]
+            if 'peak_bytes' in r: t['peak_bytes'] = max(t.get('peak_bytes', 0), r['peak_bytes'])
+        return list(rv.values())
+
+    def dump(self, out):
+        '''write the records and the totals as JSON into the text stream out'''
+        json.dump(dict(records=self.records, totals=self.totals()), out, indent=1)
+        out.write('\n')
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# File:  samples.py
+# Created on:  Sun Oct 18 11:40:02 UTC 2026
+'''Loading of .smp sample files shared by loops_stub.py and chk.py.
+
+With NumPy the samples are parsed into a uint8 matrix (one row per sample,
+the class in the last column), which is also written next to the sample
+file as <file>.bin. Later loads memory-map that cache as long as the sample
+file did not change. Without NumPy the samples are lists of ints as before.
+'''
+import os, io, struct
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAGIC = b'SMPBIN01'
+HEADER = struct.Struct('<8sqqqqq') # magic, source size, source mtime, rows, columns, header length
+CACHE_SUFFIX = '.bin'
+
+def parse_lists(f):
+    '''parse the lines of a sample file into the header numbers and lists of ints'''
+    nms = None
+    samples = []
+    for l in f:
+        s = l.rstrip().split()
+        if not s: continue
+        if nms:
+            samples.append([int(l) for l in s])
+        else:
+            nms = [int(l) for l in s]
+    return (nms, samples)
+
+def _parse_matrix(data):
+    hdr, _, body = data.lstrip().partition(b'\n')
+    nms = [int(x) for x in hdr.split()]
+    # numbers per line: a number starts at a non-blank byte after a blank one
+    b = np.frombuffer(body, dtype=np.uint8)
+    blank = b <= ord(' ') # whitespace and other control characters
+    starts = ~blank & np.concatenate(([True], blank[:-1]))
+    per_line = np.bincount(np.cumsum(b == ord('\n'))[starts])
+    per_line = per_line[per_line != 0] # empty lines are skipped
+    if not len(per_line): return nms, np.zeros((0, 0), dtype=np.uint8)
+    cols = int(per_line[0])
+    if (per_line != cols).any(): raise ValueError('samples of different lengths')
+    vals = np.fromstring(body, dtype=np.int64, sep=' ')
+    if len(vals) != len(per_line) * cols: raise ValueError('malformed sample values')
+    if ((vals < 0) | (vals > 255)).any(): raise ValueError('sample values out of range')
+    return nms, vals.astype(np.uint8).reshape(-1, cols)
+
+def _cache_key(fn):
+    st = os.stat(fn)
+    return st.st_size, st.st_mtime_ns
+
+def _read_cache(fn):
+    try:
+        with open(fn + CACHE_SUFFIX, 'rb') as f:
+            magic, size, mtime, rows, cols, hlen = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or (size, mtime) != _cache_key(fn): return None
+            nms = [int(x) for x in f.read(hlen).split()]
+    except (OSError, struct.error):
+        return None
+    if rows * cols == 0: return nms, np.zeros((rows, cols), dtype=np.uint8)
+    return nms, np.memmap(fn + CACHE_SUFFIX, dtype=np.uint8, mode='r', offset=HEADER.size + hlen, shape=(rows, cols))
+
+def _write_cache(fn, nms, m):
+    hdr = ' '.join(map(str, nms)).encode('ascii')
+    tmp = '{}{}.{}'.format(fn, CACHE_SUFFIX, os.getpid())
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, *_cache_key(fn), m.shape[0], m.shape[1], len(hdr)))
+            f.write(hdr)
+            f.write(m.tobytes())
+        os.replace(tmp, fn + CACHE_SUFFIX)
+    except OSError: # e.g. a read-only directory, the cache is only an optimization
+        try: os.remove(tmp)
+        except OSError: pass
+
+def read_samples(f):
+    '''parse the sample file in the binary stream f like load_samples, without a cache'''
+    if np is None:
+        return parse_lists(io.TextIOWrapper(f, encoding='ascii'))
+    return _parse_matrix(f.read())
+
+def load_samples(fn, cache=True):
+    '''load the sample file fn, returns the header numbers and the samples,
+    a uint8 matrix with NumPy and a list of lists of ints without it'''
+    if np is None:
+        with open(fn) as f:
+            return parse_lists(f)
+    if cache:
+        rv = _read_cache(fn)
+        if rv: return rv
+    with open(fn, 'rb') as f:
+        nms, m = read_samples(f)
+    if cache: _write_cache(fn, nms, m)
+    return nms, m
+
+def unique_rows(m):
+    '''the distinct rows of the uint8 matrix m in ascending order and the index
+    of the first occurrence of each, rows are compared as byte strings which is
+    much faster than numpy.unique with an axis'''
+    m = np.ascontiguousarray(m, dtype=np.uint8)
+    _, first = np.unique(m.view(np.dtype((np.void, m.shape[1]))).ravel(), return_index=True)
+    return m[first], first
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+# File:  solvers.py
+# Created on:  Sun Oct 18 11:26:50 UTC 2026
+'''SAT solver backends for Enc.
+
+A backend has solve(e, assumptions=(), phases=()) returning (exit code,
+model): the exit code follows the SAT competition convention (10 SAT,
+20 UNSAT) and the model is a Model of the variables e.model_vars(), or None
+unless SAT. Phases are literals the solver should prefer, backends may
+ignore them. A solve stopped by a time or memory limit has the exit code
+UNKNOWN.
+'''
+import subprocess, os, time, json, asyncio
+try:
+    import resource
+except ImportError: # not on Windows
+    resource = None
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+solver = './cryptominisat5'
+UNKNOWN = 0 # as in the SAT competition
+
+class Model:
+    '''values of the variables in the range keep, one byte per variable (0
+    unknown, 1 false, 2 true) and read like a dict from variable ids to bools.
+    Without keep the bytes grow up to the largest variable set.'''
+    __slots__ = ('lo', 'hi', 'vals')
+
+    def __init__(self, keep=None):
+        self.lo, self.hi = (keep.start, keep.stop) if keep is not None else (1, None)
+        self.vals = bytearray(self.hi - self.lo if self.hi is not None else 0)
+
+    def __contains__(self, v):
+        i = v - self.lo
+        return 0 <= i < len(self.vals) and self.vals[i] != 0
+
+    def __getitem__(self, v):
+        if v not in self: raise KeyError(v)
+        return self.vals[v - self.lo] == 2
+
+    def get(self, v, default=None):
+        return self[v] if v in self else default
+
+    def _grow(self, v):
+        if self.hi is None and v - self.lo >= len(self.vals):
+            self.vals.extend(bytes(v - self.lo + 1 - len(self.vals)))
+
+    def set_lits(self, lits):
+        '''set the variables of the literals lits (ints, 0 is skipped) in the range'''
+        lo, hi = self.lo, self.hi
+        for l in lits:
+            v = l if l > 0 else -l
+            if v < lo or (hi is not None and v >= hi): continue
+            self._grow(v)
+            self.vals[v - lo] = 2 if l > 0 else 1
+
+    def set_text(self, text):
+        '''set the literals of text (bytes of whitespace separated ints)'''
+        if np is None:
+            self.set_lits(map(int, text.split()))
+            return
+        lits = np.fromstring(text, dtype=np.int64, sep=' ')
+        vs = np.abs(lits) - self.lo
+        keep = (lits != 0) & (vs >= 0)
+        if self.hi is not None: keep &= vs < len(self.vals)
+        lits, vs = lits[keep], vs[keep]
+        if not len(vs): return
+        self._grow(int(vs.max()) + self.lo)
+        np.frombuffer(self.vals, dtype=np.uint8)[vs] = np.where(lits > 0, 2, 1)
+
+class ModelReader:
+    '''parser of solver output fed in chunks of bytes as the solver writes it,
+    status is the word of the s line and the v lines go into model, a Model
+    of the variables in keep'''
+    def __init__(self, keep=None):
+        self.model = Model(keep)
+        self.status = None
+        self.found = False # whether there was a v line
+        self.rest = b'' # an incomplete last line
+
+    def feed(self, data):
+        data = self.rest + data
+        end = data.rfind(b'\n') + 1
+        self.rest = data[end:]
+        self._lines(data[:end])
+
+    def close(self):
+        self._lines(self.rest)
+        self.rest = b''
+
+    def _lines(self, data):
+        vs = []
+        for l in data.splitlines():
+            if l[:2] in (b'v ', b'V '):
+                vs.append(l[2:])
+            elif l[:2] == b's ':
+                self.status = str(l[2:].strip(), encoding='ascii')
+        if vs:
+            self.found = True
+            self.model.set_text(b' '.join(vs)) # a chunk at once, the lines are short
+
+def _limit_memory(mem_limit):
+    def f():
+        resource.setrlimit(resource.RLIMIT_AS, (mem_limit, mem_limit))
+    return f
+
+async def solve_async(e, cmd=solver, assumptions=(), timeout=None, mem_limit=None, keep=None):
+    '''run the solver cmd (a path or an argument list) on the CNF of e in the
+    running event loop, so that several solves can share one loop. The solver
+    is killed after timeout seconds or when the solve is cancelled, mem_limit
+    bounds its address space in bytes. The CNF is formatted chunk by chunk
+    while the solver reads it and the output is parsed while it is written.
+    Returns the exit code, UNKNOWN if a limit was hit, and the Model of the
+    variables in keep (None unless SAT).'''
+    return await _run_cnf((s.encode('ascii') for s in e.cnf_chunks(assumptions)), cmd, timeout, mem_limit, keep)
+
+async def _run_cnf(chunks, cmd, timeout, mem_limit, keep):
+    '''solve_async on the CNF given as an iterable of bytes, the solver stays in
+    the process group of the caller so that killing the group also kills it'''
+    if mem_limit and resource is None: raise ValueError('memory limits are not supported on this system')
+    p = await asyncio.create_subprocess_exec(*([cmd] if isinstance(cmd, str) else cmd),
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        preexec_fn=_limit_memory(mem_limit) if mem_limit else None)
+    reader = ModelReader(keep)
+    async def write():
+        try:
+            for data in chunks:
+                p.stdin.write(data)
+                await p.stdin.drain()
+            p.stdin.close()
+        except (BrokenPipeError, ConnectionResetError): # the solver may stop reading early
+            pass
+    async def run():
+        w = asyncio.ensure_future(write())
+        try:
+            while True:
+                chunk = await p.stdout.read(1 << 16)
+                if not chunk: break
+                reader.feed(chunk)
+            await w
+        finally:
+            w.cancel()
+        reader.close()
+        return await p.wait()
+    try:
+        rc = await asyncio.wait_for(run(), timeout)
+    except asyncio.TimeoutError:
+        return UNKNOWN, None
+    finally:
+        if p.returncode is None:
+            try:
+                p.kill()
+            except ProcessLookupError:
+                pass
+            await p.wait()
+    if mem_limit and rc not in (10, 20): # out of memory ends in bad_alloc or a crash
+        return UNKNOWN, None
+    return rc, reader.model if rc == 10 and reader.found else None
+
+def run_solver(e, cmd=solver, assumptions=(), timeout=None, mem_limit=None, keep=None):
+    '''blocking version of solve_async'''
+    return asyncio.run(solve_async(e, cmd, assumptions, timeout, mem_limit, keep))
+
+class SubprocessSolver:
+    '''runs the solver binary cmd on the whole CNF for every call with the
+    limits of solve_async, assumptions are sent as unit clauses, phases are ignored'''
+    def __init__(self, cmd=solver, timeout=None, mem_limit=None):
+        self.cmd = cmd
+        self.timeout = timeout
+        self.mem_limit = mem_limit
+
+    async def solve_async(self, e, assumptions=(), phases=()):
+        return await solve_async(e, self.cmd, assumptions, self.timeout, self.mem_limit, e.model_vars())
+
+    def solve(self, e, assumptions=(), phases=()):
+        return asyncio.run(self.solve_async(e, assumptions, phases))
+
+# solver configurations raced by PortfolioSolver as (name, command), local
+# binaries of other solvers with the same output and exit codes join when present
+portfolio = [
+    ('default', [solver]),
+    ('threads4', [solver, '--threads', '4']),
+    ('luby', [solver, '--restart', 'luby']),
+    ('geom', [solver, '--restart', 'geom']),
+]
+portfolio_binaries = ['./kissat', './cadical']
+
+def default_portfolio():
+    '''portfolio and the binaries of portfolio_binaries that exist'''
+    return portfolio + [(os.path.basename(b), [b]) for b in portfolio_binaries if os.access(b, os.X_OK)]
+
+async def race_async(e, configs, assumptions=(), timeout=None, mem_limit=None, keep=None):
+    '''run the CNF of e under all configurations (name, command) at once with
+    the limits of solve_async, the first SAT or UNSAT answer wins and the other
+    solvers are killed. Returns the exit code, the model, the name of the
+    winner (None if there is none) and the seconds until the answer; without
+    a winner the exit code is UNKNOWN, or that of a failed solver. The CNF is
+    formatted once for all configurations, so unlike solve_async it is held
+    in memory as a whole.'''
+    data = [''.join(e.cnf_chunks(assumptions)).encode('ascii')]
+    t0 = time.perf_counter()
+    async def run(nm, cmd):
+        return (nm,) + await _run_cnf(data, cmd, timeout, mem_limit, keep)
+    tasks = [asyncio.ensure_future(run(nm, cmd)) for (nm, cmd) in configs]
+    rc = UNKNOWN
+    try:
+        for t in asyncio.as_completed(tasks):
+            nm, r, model = await t
+            if r in (10, 20):
+                return r, model, nm, time.perf_counter() - t0
+            if r != UNKNOWN: rc = r
+    finally:
+        for t in tasks:
+            t.cancel() # kills the solver
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return rc, None, None, time.perf_counter() - t0
+
+class PortfolioSolver:
+    '''races the solver configurations configs (see race_async) for every
+    call. The winners are kept in wins as (name, exit code, seconds) and, if
+    stats is a file name, appended to it as JSON lines with the CNF size for
+    tuning the portfolio. Assumptions are sent as unit clauses, phases are ignored.'''
+    def __init__(self, configs=None, timeout=None, mem_limit=None, stats=None):
+        self.configs = configs or default_portfolio()
+        self.timeout = timeout
+        self.mem_limit = mem_limit
+        self.stats = stats
+        self.wins = []
+
+    async def solve_async(self, e, assumptions=(), phases=()):
+        rc, model, nm, t = await race_async(e, self.configs, assumptions, self.timeout, self.mem_limit, e.model_vars())
+        if nm is not None:
+            self.wins.append((nm, rc, t))
+            if self.stats:
+                rec = dict(config=nm, rc=rc, time=t, vars=e.var_count, clauses=len(e.constraints),
+                           configs=[c for (c, _) in self.configs])
+                with open(self.stats, 'a') as f:
+                    f.write(json.dumps(rec) + '\n') # one write, lines of concurrent runs do not mix
+        return rc, model
+
+    def solve(self, e, assumptions=(), phases=()):
+        return asyncio.run(self.solve_async(e, assumptions, phases))
+
+class IncrementalSolver:
+    '''keeps one in-process solver of the python-sat package (or of pycryptosat
+    if python-sat is missing) for an encoder. Clauses added to the encoder since
+    the previous call are passed on, learned clauses are kept between calls and
+    assumptions do not change the formula. Phases are only supported by python-sat.
+    A different encoder starts a new solver, so only callers that solve one Enc
+    several times keep learned clauses; minimize encodes every size anew and
+    gains only the missing process start and CNF text round trip.'''
+    def __init__(self, name='cadical153'):
+        self.name = name
+        self.enc = None
+        self.sat = None
+
+    def _reset(self, e):
+        try:
+            from pysat.solvers import Solver
+            self.sat = Solver(name=self.name)
+            self.pysat = True
+        except ImportError:
+            from pycryptosat import Solver
+            self.sat = Solver()
+            self.pysat = False
+        self.enc = e
+        self.added = 0
+
+    def _model(self, e, lits):
+        model = Model(e.model_vars())
+        model.set_lits(lits)
+        return model
+
+    def solve(self, e, assumptions=(), phases=()):
+        if e is not self.enc: self._reset(e)
+        for c in e.constraints.clauses(self.added):
+            self.sat.add_clause(c)
+        self.added = len(e.constraints)
+        if self.pysat:
+            if phases: self.sat.set_phases(list(phases))
+            if not self.sat.solve(assumptions=list(assumptions)): return 20, None
+            return 10, self._model(e, self.sat.get_model())
+        ok, sol = self.sat.solve(list(assumptions))
+        if not ok: return 20, None
+        return 10, self._model(e, (v if sol[v] else -v for v in range(1, len(sol))))
+
+def have_binding():
+    '''whether a python SAT binding for IncrementalSolver is installed'''
+    for m in ('pysat.solvers', 'pycryptosat'):
+        try:
+            __import__(m)
+            return True
+        except ImportError:
+            pass
+    return False
+
+backends = ['auto', 'subprocess', 'incremental', 'portfolio']
+
+def make_backend(kind='auto', timeout=None, mem_limit=None, stats=None):
+    '''create a backend, 'auto' is the in-process one when a binding is installed
+    and the solver binary otherwise. Only solver binaries can be stopped, so
+    limits (seconds, bytes) select them. stats is the file of the portfolio
+    winners, see PortfolioSolver.'''
+    limited = timeout is not None or mem_limit is not None
+    if kind == 'auto':
+        kind = 'incremental' if have_binding() and not limited else 'subprocess'
+    if kind == 'incremental':
+        if limited: raise ValueError('the incremental backend does not support limits')
+        return IncrementalSolver()
+    if kind == 'subprocess':
+        return SubprocessSolver(timeout=timeout, mem_limit=mem_limit)
+    if kind == 'portfolio':
+        return PortfolioSolver(timeout=timeout, mem_limit=mem_limit, stats=stats)
+    raise ValueError("unknown solver backend: {}".format(kind))
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# File:  trees.py
+# Created on:  Sun Oct 18 11:31:25 UTC 2026
+'''Decision trees as used by the encoding, and a greedy ID3 style builder.
+
+Nodes are numbered 1..size, the children of an internal node i are l[i] and
+l[i]+1 == r[i], l[i] even, a[i] is the feature tested at i (the left child
+is taken when it is 0) and c[i] is the class of leaf i.'''
+from collections import namedtuple, deque
+from math import log2
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+Tree = namedtuple('Tree', 'size l r a c')
+
+def _entropy(ss):
+    if not ss: return 0.0
+    p = sum(s[-1] for s in ss) / len(ss)
+    if p == 0 or p == 1: return 0.0
+    return -p * log2(p) - (1 - p) * log2(1 - p)
+
+def _majority(ss):
+    return 1 if 2 * sum(s[-1] for s in ss) > len(ss) else 0
+
+def greedy_tree(input_count, samples):
+    '''build a tree consistent with samples (which must not contain conflicting
+    samples) by splitting on the feature of the largest information gain, no
+    feature is tested twice on a path. Nodes are numbered in BFS order, which
+    fits the encoding. Returns None if there are no features.
+    A NumPy matrix of samples is split without turning it into lists.'''
+    if input_count == 0: return None
+    if np is not None and isinstance(samples, np.ndarray):
+        return _greedy_matrix(input_count, samples)
+    l, r, a, c = dict(), dict(), dict(), dict()
+    queue = deque([(1, samples, frozenset(), 0)])
+    nxt = 2
+    while queue:
+        i, ss, used, cls = queue.popleft()
+        if ss: cls = _majority(ss)
+        best = None
+        if len(set(s[-1] for s in ss)) > 1:
+            for k in range(input_count):
+                if k in used: continue
+                ones = [s for s in ss if s[k]]
+                if not ones or len(ones) == len(ss): continue
+                zeros = [s for s in ss if not s[k]]
+                h = (len(zeros) * _entropy(zeros) + len(ones) * _entropy(ones)) / len(ss)
+                if best is None or h < best[0]: best = (h, k)
+        elif i == 1: # the root is never a leaf in the encoding
+            best = (0, 0)
+        if best is None:
+            c[i] = cls
+            continue
+        k = best[1]
+        a[i], l[i], r[i] = k + 1, nxt, nxt + 1
+        queue.append((nxt, [s for s in ss if not s[k]], used | {k}, cls))
+        queue.append((nxt + 1, [s for s in ss if s[k]], used | {k}, cls))
+        nxt += 2
+    return Tree(nxt - 1, l, r, a, c)
+
+def _entropies(pos, n):
+    '''entropies of the classes of n samples with pos positive ones, arrays'''
+    p = pos / n
+    h = -p * np.log2(p) - (1 - p) * np.log2(1 - p)
+    return np.where((pos == 0) | (pos == n), 0.0, h)
+
+def _greedy_matrix(input_count, m):
+    '''greedy_tree on the rows of the matrix m, samples of a node are row indices'''
+    x = m[:, :input_count] != 0
+    y = m[:, -1] != 0
+    l, r, a, c = dict(), dict(), dict(), dict()
+    queue = deque([(1, np.arange(len(m)), frozenset(), 0)])
+    nxt = 2
+    while queue:
+        i, rows, used, cls = queue.popleft()
+        n = len(rows)
+        pos = int(y[rows].sum())
+        if n: cls = 1 if 2 * pos > n else 0
+        best = None
+        if 0 < pos < n:
+            xs = x[rows]
+            ones = xs.sum(axis=0)
+            pos1 = (xs & y[rows, None]).sum(axis=0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                h = ((n - ones) * _entropies(pos - pos1, n - ones) + ones * _entropies(pos1, ones)) / n
+            ok = (ones > 0) & (ones < n)
+            ok[list(used)] = False
+            if ok.any(): best = int(np.argmin(np.where(ok, h, np.inf)))
+        elif i == 1: # the root is never a leaf in the encoding
+            best = 0
+        if best is None:
+            c[i] = cls
+            continue
+        k = best
+        a[i], l[i], r[i] = k + 1, nxt, nxt + 1
+        queue.append((nxt, rows[~x[rows, k]], used | {k}, cls))
+        queue.append((nxt + 1, rows[x[rows, k]], used | {k}, cls))
+        nxt += 2
+    return Tree(nxt - 1, l, r, a, c)
+
+def write_tree(t, out, features=None):
+    '''write the l/r/a/c lines of tree t in one write, features maps feature k
+    to features[k-1] in the output'''
+    lns = ['a {} {}\n'.format(features[k-1] if features else k, i) for i, k in sorted(t.a.items())]
+    lns += ['c {} {}\n'.format(i, k) for i, k in sorted(t.c.items())]
+    lns += ['l {} {}\n'.format(i, j) for i, j in sorted(t.l.items())]
+    lns += ['r {} {}\n'.format(i, j) for i, j in sorted(t.r.items())]
+    out.write(''.join(lns))